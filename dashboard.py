@@ -1,9 +1,12 @@
 # dashboard.py
 
+import glob
+import os
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import numpy as np
+from numba import njit
 
 # --- CONFIGURACIÓN DE PÁGINA ---
 st.set_page_config(
@@ -13,29 +16,210 @@ st.set_page_config(
 )
 
 # --- FUNCIÓN DE CARGA Y PREPROCESAMIENTO DE DATOS ---
+CSV_DTYPES = {
+    'restaurant_id': 'category',
+    'channel_id': 'category',
+    'status': 'category',
+    'customer_id': 'category',
+    'date_id': 'string[pyarrow]',
+    # float64: float32 no representa céntimos en las sumas por encima de ~131k €
+    'total_spent': 'float64',
+    'guests': 'int8',
+}
+# Combinaciones de filtros que guarda cada agregación cacheada (LRU) antes de descartar las antiguas
+FILTER_CACHE_ENTRIES = 32
+# Versión del preprocesado: súbela al cambiar tipos o columnas para invalidar los Parquet antiguos
+CACHE_VERSION = 5
+CACHE_COLUMNS = ['date', 'month_int', 'week', 'channel_name']
+
+def cache_is_current(df):
+    # Red de seguridad por si se olvida subir CACHE_VERSION: columnas derivadas presentes,
+    # channel_name categórico y filas ordenadas por fecha (el filtro usa searchsorted)
+    return (set(CACHE_COLUMNS) <= set(df.columns)
+            and isinstance(df['channel_name'].dtype, pd.CategoricalDtype)
+            and df['date'].is_monotonic_increasing)
+
 @st.cache_data
 def load_and_process_data(file_path):
-    df = pd.read_csv(file_path)
-    df['date'] = pd.to_datetime(df['date_id'].str.replace('D', ''), format='%Y%m%d')
-    df['month'] = df['date'].dt.to_period('M')
+    # Caché en disco: Parquet ligado al mtime del CSV, sobrevive a reinicios de Streamlit
+    cache_path = f"{file_path}.{os.stat(file_path).st_mtime_ns}.v{CACHE_VERSION}.parquet"
+    try:
+        df = pd.read_parquet(cache_path)
+        if cache_is_current(df):
+            return df
+    except (OSError, ValueError):
+        # Sin caché o Parquet ilegible (p. ej. truncado): se vuelve a parsear el CSV
+        pass
+    df = pd.read_csv(file_path, engine="pyarrow", dtype_backend="pyarrow", dtype=CSV_DTYPES)
+    # date_id tiene la forma 'DYYYYMMDD'; cache=True parsea solo las fechas únicas
+    df['date'] = pd.to_datetime(df['date_id'].str.slice(1), format='%Y%m%d', cache=True)
+    # Mes como entero year*12+month: aritmética int32 pura en lugar de PeriodArray
+    df['month_int'] = df['date'].dt.year.values.astype('int32') * 12 + df['date'].dt.month.values.astype('int32')
+    # Semana etiquetada con el lunes de cierre (W-MON): el 1970-01-01 fue jueves, de ahí el +3
+    days = df['date'].values.astype('datetime64[D]')
+    df['week'] = days + (-(days.view('int64') + 3) % 7).astype('timedelta64[D]')
     channel_mapping = {'CH1': 'Web', 'CH2': 'App', 'CH3': 'Teléfono', 'CH4': 'Partner'}
-    df['channel_name'] = df['channel_id'].map(channel_mapping).fillna('Otro')
+    channel_names = ['Web', 'App', 'Teléfono', 'Partner', 'Otro']
+    # Se traducen las categorías, no las filas; el código -1 (NaN) cae en 'Otro'
+    code_lookup = np.array([channel_names.index(channel_mapping.get(c, 'Otro')) for c in df['channel_id'].cat.categories] + [channel_names.index('Otro')])
+    df['channel_name'] = pd.Categorical.from_codes(code_lookup[df['channel_id'].cat.codes.values], categories=channel_names)
+    # Orden por fecha para poder filtrar rangos con searchsorted
+    df = df.sort_values('date', kind='stable', ignore_index=True)
+    # Escritura atómica y opcional: un fichero a medias nunca queda con el nombre final,
+    # y en un despliegue de solo lectura el dashboard sigue funcionando sin caché
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        df.to_parquet(tmp_path, compression="zstd")
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    else:
+        # Los sidecars de mtimes o versiones anteriores ya no se leerán: se borran sin bloquear la carga
+        for stale_path in glob.glob(f"{glob.escape(file_path)}.*.parquet"):
+            if stale_path != cache_path:
+                try:
+                    os.remove(stale_path)
+                except OSError:
+                    pass
     return df
 
 # --- FUNCIÓN PARA ANÁLISIS DE RETENCIÓN (COHORTS) ---
-@st.cache_data
-def calculate_retention(df):
-    df_retention = df.copy()
-    df_retention['acquisition_month'] = df_retention.groupby('customer_id')['month'].transform('min')
-    acq_month_int = df_retention['acquisition_month'].dt.year * 12 + df_retention['acquisition_month'].dt.month
-    current_month_int = df_retention['month'].dt.year * 12 + df_retention['month'].dt.month
-    df_retention['cohort_index'] = current_month_int - acq_month_int
-    cohort_data = df_retention.groupby(['acquisition_month', 'cohort_index'])['customer_id'].nunique().reset_index()
-    cohort_counts = cohort_data.pivot_table(index='acquisition_month', columns='cohort_index', values='customer_id')
+@njit(cache=True)
+def cohort_months(customer_codes, month_int, n_customers):
+    # Primer pase: mes mínimo por cliente; segundo pase: mes de adquisición e índice de cohorte por fila
+    min_month = np.full(n_customers, np.iinfo(np.int32).max, dtype=np.int32)
+    for i in range(month_int.shape[0]):
+        if month_int[i] < min_month[customer_codes[i]]:
+            min_month[customer_codes[i]] = month_int[i]
+    acquisition_month = np.empty_like(month_int)
+    cohort_index = np.empty_like(month_int)
+    for i in range(month_int.shape[0]):
+        acquisition_month[i] = min_month[customer_codes[i]]
+        cohort_index[i] = month_int[i] - acquisition_month[i]
+    return acquisition_month, cohort_index
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def calculate_retention(_df, filter_key):
+    # Sin copiar el DataFrame de entrada: solo un frame de tres columnas enteras
+    customer_id = _df['customer_id'].cat
+    customer_codes = customer_id.codes.values
+    month_int = _df['month_int'].values
+    # customer_id ausente tiene código -1: Numba indexaría min_month[-1] (último cliente), así que
+    # esas filas se descartan igual que hacía el groupby con claves NaN
+    has_customer = customer_codes >= 0
+    if not has_customer.all():
+        customer_codes, month_int = customer_codes[has_customer], month_int[has_customer]
+    acquisition_month, cohort_index = cohort_months(customer_codes, month_int, len(customer_id.categories))
+    df_retention = pd.DataFrame({'acquisition_month': acquisition_month, 'cohort_index': cohort_index, 'customer_id': customer_codes})
+    # Deduplicación global + size en lugar de nunique por grupo
+    cohort_data = df_retention.drop_duplicates().groupby(['acquisition_month', 'cohort_index']).size()
+    cohort_counts = cohort_data.unstack('cohort_index')
     cohort_sizes = cohort_counts.iloc[:, 0]
     retention_matrix = cohort_counts.divide(cohort_sizes, axis=0) * 100
+    # Etiquetas 'YYYY-MM' solo para el eje de la visualización
+    retention_matrix.index = retention_matrix.index.map(lambda m: f"{(m - 1) // 12}-{(m - 1) % 12 + 1:02d}")
     return retention_matrix
 
+# --- DOWNSAMPLING DE SERIES TEMPORALES (LTTB) ---
+LTTB_POINTS = 500
+
+def lttb_indices(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: conserva la forma visual de la serie con n_out puntos
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    buckets = np.array_split(np.arange(1, n - 1), n_out - 2)
+    selected = [0]
+    for i, bucket in enumerate(buckets):
+        next_bucket = buckets[i + 1] if i + 1 < len(buckets) else np.array([n - 1])
+        avg_x, avg_y = x[next_bucket].mean(), y[next_bucket].mean()
+        a = selected[-1]
+        area = np.abs((x[a] - avg_x) * (y[bucket] - y[a]) - (x[a] - x[bucket]) * (avg_y - y[a]))
+        selected.append(bucket[area.argmax()])
+    selected.append(n - 1)
+    return np.array(selected)
+
+def downsample_series(df, x_col, y_col, group_col, n_out=LTTB_POINTS):
+    # Aplica LTTB a cada serie (grupo) por separado; df debe venir ordenado por x dentro de cada grupo
+    x = df[x_col].values.astype('int64').astype('float64')
+    y = df[y_col].values.astype('float64')
+    keep = [pos[lttb_indices(x[pos], y[pos], n_out)] for pos in df.groupby(group_col, observed=True).indices.values()]
+    return df.iloc[np.sort(np.concatenate(keep))]
+
+# --- ESTADÍSTICOS DE BOXPLOT PRECALCULADOS ---
+def box_summary(values, keys):
+    # Cuartiles, bigotes (dato más lejano dentro de 1.5·IQR, como Plotly) y atípicos por grupo,
+    # para enviar al navegador solo el resumen de cada caja y no todas las filas
+    stats = values.groupby(keys, observed=True).quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ['q1', 'median', 'q3']
+    iqr = stats['q3'] - stats['q1']
+    lower = (stats['q1'] - 1.5 * iqr).reindex(keys).values
+    upper = (stats['q3'] + 1.5 * iqr).reindex(keys).values
+    inside = (values.values >= lower) & (values.values <= upper)
+    fences = values[inside].groupby(keys[inside], observed=True).agg(['min', 'max'])
+    stats['lowerfence'], stats['upperfence'] = fences['min'], fences['max']
+    return stats, values[~inside], keys[~inside]
+
+def sorted_quantile(sorted_values, q):
+    # Cuantil con interpolación lineal (igual que pandas) sobre un array ya ordenado
+    pos = q * (len(sorted_values) - 1)
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return float(sorted_values[lo]) + (float(sorted_values[hi]) - float(sorted_values[lo])) * (pos - lo)
+
+def box_figure(stats, outlier_values, outlier_keys, x):
+    import plotly.graph_objects as go
+    color = '#636efa'
+    fig = go.Figure(go.Box(x=x, q1=stats['q1'], median=stats['median'], q3=stats['q3'],
+        lowerfence=stats['lowerfence'], upperfence=stats['upperfence'], marker_color=color, boxpoints=False))
+    fig.add_trace(go.Scatter(x=outlier_keys, y=outlier_values, mode='markers', marker_color=color, hoverinfo='y'))
+    fig.update_layout(showlegend=False)
+    return fig
+
+# --- AGREGACIONES CACHEADAS POR COMBINACIÓN DE FILTROS ---
+# Los DataFrames llevan prefijo '_' para que Streamlit no los hashee: la clave de caché es filter_key
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def compute_restaurant_summary(_df_filtered, filter_key):
+    # Una sola agregación por (restaurante, estado): ingresos del slice 'Confirmada', conteos de 'size'
+    restaurant_stats = _df_filtered.groupby(['restaurant_id', 'status'], observed=True)['total_spent'].agg(['sum', 'mean', 'size']).unstack('status')
+    status_counts = restaurant_stats['size'].fillna(0).astype('int64')
+    restaurant_summary = pd.DataFrame({
+        'Ingresos_Totales': restaurant_stats[('sum', 'Confirmada')].fillna(0),
+        'Ticket_Promedio': restaurant_stats[('mean', 'Confirmada')].fillna(0),
+        **{status: status_counts.get(status, 0) for status in ('Confirmada', 'Cancelada', 'No Show')},
+    })
+    restaurant_summary['Total_Reservas'] = restaurant_summary[['Confirmada', 'Cancelada', 'No Show']].sum(axis=1)
+    restaurant_summary['Tasa_Cancelacion_%'] = (restaurant_summary['Cancelada'] / restaurant_summary['Total_Reservas'] * 100).round(1)
+    restaurant_summary['Tasa_NoShow_%'] = (restaurant_summary['No Show'] / restaurant_summary['Total_Reservas'] * 100).round(1)
+    return restaurant_summary
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def compute_weekly_revenue(_df_confirmadas, filter_key):
+    weekly_revenue = _df_confirmadas.groupby(['restaurant_id', 'week'], observed=True)['total_spent'].sum().reset_index()
+    return downsample_series(weekly_revenue, 'week', 'total_spent', 'restaurant_id')
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def compute_spend_distribution(_df_confirmadas, filter_key):
+    # Un único sort alimenta los percentiles, el máximo y el umbral de atípicos
+    spent = _df_confirmadas['total_spent']
+    sorted_spent = np.sort(spent.values)
+    q1, median, q3 = (sorted_quantile(sorted_spent, q) for q in (0.25, 0.5, 0.75))
+    iqr = q3 - q1
+    upper_bound = q3 + 1.5 * iqr
+    lo = np.searchsorted(sorted_spent, q1 - 1.5 * iqr)
+    hi = np.searchsorted(sorted_spent, upper_bound, side='right')
+    n_outliers = len(sorted_spent) - hi
+    spending = {'q1': q1, 'median': median, 'q3': q3, 'max': float(sorted_spent[-1]), 'upper_bound': upper_bound}
+    premium_bookings = _df_confirmadas.nlargest(min(n_outliers, 5), 'total_spent')[['restaurant_id', 'total_spent', 'channel_name']]
+    # Caja global desde el mismo array ordenado: los bigotes y los atípicos son sus dos colas
+    spend_stats = pd.DataFrame({'q1': [q1], 'median': [median], 'q3': [q3],
+        'lowerfence': [sorted_spent[lo]], 'upperfence': [sorted_spent[hi - 1]]})
+    spend_outliers = np.concatenate([sorted_spent[:lo], sorted_spent[hi:]])
+    spend_box = (spend_stats, spend_outliers, np.zeros(len(spend_outliers), dtype='int8'))
+    restaurant_box = box_summary(spent, _df_confirmadas['restaurant_id'])
+    return spending, premium_bookings, spend_box, restaurant_box
+
 # --- EJECUCIÓN PRINCIPAL ---
 file_name = "Synthetic reserves dataset.csv"
 try:
@@ -61,126 +245,146 @@ selected_channels = st.sidebar.multiselect('Selecciona Canal(es) de Reserva', op
 
 # --- FILTRADO DEL DATAFRAME ---
 start_date, end_date = pd.to_datetime(selected_date_range[0]), pd.to_datetime(selected_date_range[1])
-df_filtered = df_base[(df_base['date'] >= start_date) & (df_base['date'] <= end_date) & (df_base['restaurant_id'].isin(selected_restaurants)) & (df_base['channel_name'].isin(selected_channels))]
+date_values = df_base['date'].values
+lo = np.searchsorted(date_values, np.datetime64(start_date), side='left')
+hi = np.searchsorted(date_values, np.datetime64(end_date), side='right')
+df_slice = df_base.iloc[lo:hi]
+# Filtros categóricos comparando códigos enteros en vez de valores de texto
+restaurant_codes = df_base['restaurant_id'].cat.categories.get_indexer(selected_restaurants)
+channel_codes = df_base['channel_name'].cat.categories.get_indexer(selected_channels)
+category_mask = np.isin(df_slice['restaurant_id'].cat.codes.values, restaurant_codes)
+category_mask &= np.isin(df_slice['channel_name'].cat.codes.values, channel_codes)
+df_filtered = df_slice[category_mask]
+filter_key = (tuple(selected_restaurants), tuple(selected_channels), start_date, end_date)
 st.sidebar.metric(label="Total Reservas (Bruto)", value=f"{len(df_filtered)}")
 
 # --- CUERPO PRINCIPAL DEL DASHBOARD ---
 if df_filtered.empty:
     st.warning("No hay datos disponibles para los filtros seleccionados.")
 else:
-    st.header("🎯 Executive KPIs & Performance Metrics")
     total_reservations_bruto = len(df_filtered)
-    df_confirmadas = df_filtered[df_filtered['status'] == 'Confirmada']
-    
-    total_revenue = df_confirmadas['total_spent'].sum()
-    avg_ticket = df_confirmadas['total_spent'].mean() if not df_confirmadas.empty else 0
-    confirmation_rate = len(df_confirmadas) / total_reservations_bruto * 100 if total_reservations_bruto > 0 else 0
-    cancellation_rate = (df_filtered['status'] == 'Cancelada').sum() / total_reservations_bruto * 100
-    no_show_rate = (df_filtered['status'] == 'No Show').sum() / total_reservations_bruto * 100
-
-    kpi1, kpi2, kpi3, kpi4, kpi5 = st.columns(5)
-    kpi1.metric("Ingresos Totales", f"€ {total_revenue:,.2f}")
-    kpi2.metric("Ticket Promedio", f"€ {avg_ticket:,.2f}")
-    kpi3.metric("Tasa de Confirmación", f"{confirmation_rate:.1f}%")
-    kpi4.metric("Tasa de Cancelación", f"{cancellation_rate:.1f}%", delta_color="inverse")
-    kpi5.metric("Tasa de No-Show", f"{no_show_rate:.1f}%", delta_color="inverse")
-    
-    st.markdown("---")
-
-    # --- SECCIÓN 1: TABLA DE RENDIMIENTO POR RESTAURANTE ---
-    st.header("🏪 Restaurant Performance Intelligence")
-    
-    if df_confirmadas.empty:
-        st.info("No hay reservas 'Confirmadas' en la selección actual para mostrar el análisis detallado.")
-    else:
-        restaurant_revenue = df_confirmadas.groupby('restaurant_id').agg(Ingresos_Totales=('total_spent', 'sum'), Ticket_Promedio=('total_spent', 'mean'))
-        status_counts = df_filtered.groupby('restaurant_id')['status'].value_counts().unstack(fill_value=0)
-        restaurant_summary = pd.concat([restaurant_revenue, status_counts], axis=1).fillna(0)
-        restaurant_summary['Total_Reservas'] = restaurant_summary[['Confirmada', 'Cancelada', 'No Show']].sum(axis=1)
-        restaurant_summary['Tasa_Cancelacion_%'] = (restaurant_summary['Cancelada'] / restaurant_summary['Total_Reservas'] * 100).round(1)
-        restaurant_summary['Tasa_NoShow_%'] = (restaurant_summary['No Show'] / restaurant_summary['Total_Reservas'] * 100).round(1)
-
-        display_cols = ['Ingresos_Totales', 'Ticket_Promedio', 'Confirmada', 'Tasa_Cancelacion_%', 'Tasa_NoShow_%']
-        st.dataframe(restaurant_summary[display_cols].sort_values('Ingresos_Totales', ascending=False),
-            column_config={ "Ingresos_Totales": st.column_config.NumberColumn(format="€ %.2f"), "Ticket_Promedio": st.column_config.NumberColumn(format="€ %.2f"),
-                "Tasa_Cancelacion_%": st.column_config.ProgressColumn(format="%.1f%%", min_value=0, max_value=100),
-                "Tasa_NoShow_%": st.column_config.ProgressColumn(format="%.1f%%", min_value=0, max_value=100),
-            }, use_container_width=True)
-
-        st.markdown("---")
-
-        st.header("📈 Revenue Trends & Channel Analytics")
-        col1, col2 = st.columns(2)
-        with col1:
-            st.subheader("Ingresos Semanales por Restaurante")
-            weekly_revenue = df_confirmadas.groupby(['restaurant_id', pd.Grouper(key='date', freq='W-Mon')])['total_spent'].sum().reset_index()
-            fig_weekly = px.line(weekly_revenue, x='date', y='total_spent', color='restaurant_id', markers=True, labels={'date': 'Semana', 'total_spent': 'Ingresos (€)'})
-            st.plotly_chart(fig_weekly, use_container_width=True)
-        with col2:
-            st.subheader("Distribución de Reservas por Canal")
-            fig_channel = px.pie(df_confirmadas, names='channel_name', hole=0.4)
-            st.plotly_chart(fig_channel, use_container_width=True)
-
-        # --- NUEVA SECCIÓN: BOXPLOT DE GASTO ---
-        st.markdown("---")
-        st.header("💎 Revenue Distribution & High-Value Customer Analysis")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Revenue Distribution Analysis")
-            fig_boxplot = px.box(
-                df_confirmadas, 
-                y='total_spent',
-                title='Customer Spending Pattern Analysis',
-                labels={'total_spent': 'Revenue per Booking (€)'}
-            )
-            fig_boxplot.update_layout(showlegend=False)
-            st.plotly_chart(fig_boxplot, use_container_width=True)
-            
-            # Estadísticas descriptivas
-            stats = df_confirmadas['total_spent'].describe()
-            st.subheader("🎯 Revenue Insights")
-            col_stats1, col_stats2 = st.columns(2)
-            with col_stats1:
-                st.metric("Median Revenue", f"€ {stats['50%']:.2f}")
-                st.metric("25th Percentile", f"€ {stats['25%']:.2f}")
-            with col_stats2:
-                st.metric("75th Percentile", f"€ {stats['75%']:.2f}")
-                st.metric("Peak Revenue", f"€ {stats['max']:.2f}")
-        
-        with col2:
-            st.subheader("Restaurant Revenue Benchmarking")
-            fig_boxplot_restaurant = px.box(
-                df_confirmadas, 
-                x='restaurant_id',
-                y='total_spent',
-                title='Revenue Performance by Location',
-                labels={'total_spent': 'Revenue (€)', 'restaurant_id': 'Restaurant ID'}
-            )
-            st.plotly_chart(fig_boxplot_restaurant, use_container_width=True)
-            
-            # Top outliers (valores atípicos)
-            q3 = df_confirmadas['total_spent'].quantile(0.75)
-            iqr = q3 - df_confirmadas['total_spent'].quantile(0.25)
-            upper_bound = q3 + 1.5 * iqr
-            outliers = df_confirmadas[df_confirmadas['total_spent'] > upper_bound]
-            
-            if not outliers.empty:
-                st.subheader("🌟 Premium Customer Bookings")
-                st.write(f"High-value bookings > €{upper_bound:.2f}")
-                st.dataframe(
-                    outliers[['restaurant_id', 'total_spent', 'channel_name']].sort_values('total_spent', ascending=False).head(),
-                    use_container_width=True
-                )
+    # Máscaras de estado calculadas una vez sobre los códigos categóricos y reutilizadas;
+    # un estado ausente de las categorías recibe -2, que no coincide con ningún código (NaN es -1)
+    status_codes = df_filtered['status'].cat.codes.values
+    status_lookup = df_filtered['status'].cat.categories.get_indexer(['Confirmada', 'Cancelada', 'No Show'])
+    code_conf, code_canc, code_ns = np.where(status_lookup < 0, -2, status_lookup)
+    mask_conf = status_codes == code_conf
+    mask_canc = status_codes == code_canc
+    mask_ns = status_codes == code_ns
+    df_confirmadas = df_filtered[mask_conf]
+    no_confirmadas_msg = "No hay reservas 'Confirmadas' en la selección actual para mostrar el análisis detallado."
+
+    # Con on_change="rerun" solo se ejecuta el contenido de la pestaña abierta (tab.open)
+    tab_kpis, tab_trends, tab_distribution, tab_retention = st.tabs(["KPIs", "Trends", "Distribution", "Retention"], key="section", on_change="rerun")
+
+    if tab_kpis.open:
+        with tab_kpis:
+            st.header("🎯 Executive KPIs & Performance Metrics")
+            total_revenue = df_confirmadas['total_spent'].sum()
+            avg_ticket = df_confirmadas['total_spent'].mean() if not df_confirmadas.empty else 0
+            confirmation_rate = np.count_nonzero(mask_conf) / total_reservations_bruto * 100 if total_reservations_bruto > 0 else 0
+            cancellation_rate = np.count_nonzero(mask_canc) / total_reservations_bruto * 100
+            no_show_rate = np.count_nonzero(mask_ns) / total_reservations_bruto * 100
+
+            kpi1, kpi2, kpi3, kpi4, kpi5 = st.columns(5)
+            kpi1.metric("Ingresos Totales", f"€ {total_revenue:,.2f}")
+            kpi2.metric("Ticket Promedio", f"€ {avg_ticket:,.2f}")
+            kpi3.metric("Tasa de Confirmación", f"{confirmation_rate:.1f}%")
+            kpi4.metric("Tasa de Cancelación", f"{cancellation_rate:.1f}%", delta_color="inverse")
+            kpi5.metric("Tasa de No-Show", f"{no_show_rate:.1f}%", delta_color="inverse")
+
+            st.markdown("---")
+
+            # --- SECCIÓN 1: TABLA DE RENDIMIENTO POR RESTAURANTE ---
+            st.header("🏪 Restaurant Performance Intelligence")
+
+            if df_confirmadas.empty:
+                st.info(no_confirmadas_msg)
+            else:
+                restaurant_summary = compute_restaurant_summary(df_filtered, filter_key)
+
+                display_cols = ['Ingresos_Totales', 'Ticket_Promedio', 'Confirmada', 'Tasa_Cancelacion_%', 'Tasa_NoShow_%']
+                st.dataframe(restaurant_summary[display_cols].sort_values('Ingresos_Totales', ascending=False),
+                    column_config={ "Ingresos_Totales": st.column_config.NumberColumn(format="€ %.2f"), "Ticket_Promedio": st.column_config.NumberColumn(format="€ %.2f"),
+                        "Tasa_Cancelacion_%": st.column_config.ProgressColumn(format="%.1f%%", min_value=0, max_value=100),
+                        "Tasa_NoShow_%": st.column_config.ProgressColumn(format="%.1f%%", min_value=0, max_value=100),
+                    }, use_container_width=True)
+
+    if tab_trends.open:
+        with tab_trends:
+            st.header("📈 Revenue Trends & Channel Analytics")
+            if df_confirmadas.empty:
+                st.info(no_confirmadas_msg)
+            else:
+                import plotly.graph_objects as go
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.subheader("Ingresos Semanales por Restaurante")
+                    weekly_revenue = compute_weekly_revenue(df_confirmadas, filter_key)
+                    fig_weekly = go.Figure([
+                        go.Scatter(x=series['week'], y=series['total_spent'], mode='lines+markers', name=restaurant)
+                        for restaurant, series in weekly_revenue.groupby('restaurant_id', observed=True)
+                    ])
+                    fig_weekly.update_layout(xaxis_title='Semana', yaxis_title='Ingresos (€)', legend_title_text='restaurant_id')
+                    st.plotly_chart(fig_weekly, use_container_width=True)
+                with col2:
+                    st.subheader("Distribución de Reservas por Canal")
+                    channel_counts = df_confirmadas['channel_name'].value_counts()
+                    channel_counts = channel_counts[channel_counts > 0]
+                    fig_channel = go.Figure(go.Pie(labels=channel_counts.index.astype(str), values=channel_counts.values, hole=0.4))
+                    st.plotly_chart(fig_channel, use_container_width=True)
+
+    # --- NUEVA SECCIÓN: BOXPLOT DE GASTO ---
+    if tab_distribution.open:
+        with tab_distribution:
+            st.header("💎 Revenue Distribution & High-Value Customer Analysis")
+            if df_confirmadas.empty:
+                st.info(no_confirmadas_msg)
             else:
-                st.info("No premium bookings detected in current selection")
-            
-        st.markdown("---")
-
-        # --- SECCIÓN 3: ANÁLISIS DE CHURN Y RETENCIÓN ---
-        st.header("🔄 Customer Retention Intelligence & Churn Analysis")
-        retention_matrix = calculate_retention(df_confirmadas)
-        
-        if retention_matrix.shape[1] < 2:
-            st.info("💡 Se necesita un rango de fechas de varios meses para calcular y visualizar la tasa de retención de cl")
+                spending, premium_bookings, spend_box, restaurant_box = compute_spend_distribution(df_confirmadas, filter_key)
+
+                col1, col2 = st.columns(2)
+
+                with col1:
+                    st.subheader("Revenue Distribution Analysis")
+                    spend_stats, spend_outliers, spend_outlier_keys = spend_box
+                    fig_boxplot = box_figure(spend_stats, spend_outliers, spend_outlier_keys, x=spend_stats.index)
+                    fig_boxplot.update_layout(title='Customer Spending Pattern Analysis', yaxis_title='Revenue per Booking (€)', xaxis_visible=False)
+                    st.plotly_chart(fig_boxplot, use_container_width=True)
+
+                    # Estadísticas descriptivas
+                    st.subheader("🎯 Revenue Insights")
+                    col_stats1, col_stats2 = st.columns(2)
+                    with col_stats1:
+                        st.metric("Median Revenue", f"€ {spending['median']:.2f}")
+                        st.metric("25th Percentile", f"€ {spending['q1']:.2f}")
+                    with col_stats2:
+                        st.metric("75th Percentile", f"€ {spending['q3']:.2f}")
+                        st.metric("Peak Revenue", f"€ {spending['max']:.2f}")
+
+                with col2:
+                    st.subheader("Restaurant Revenue Benchmarking")
+                    restaurant_box_stats, restaurant_outliers, restaurant_outlier_keys = restaurant_box
+                    fig_boxplot_restaurant = box_figure(restaurant_box_stats, restaurant_outliers, restaurant_outlier_keys, x=restaurant_box_stats.index.astype(str))
+                    fig_boxplot_restaurant.update_layout(title='Revenue Performance by Location', xaxis_title='Restaurant ID', yaxis_title='Revenue (€)')
+                    st.plotly_chart(fig_boxplot_restaurant, use_container_width=True)
+
+                    # Top outliers (valores atípicos)
+                    if not premium_bookings.empty:
+                        st.subheader("🌟 Premium Customer Bookings")
+                        st.write(f"High-value bookings > €{spending['upper_bound']:.2f}")
+                        st.dataframe(premium_bookings, use_container_width=True)
+                    else:
+                        st.info("No premium bookings detected in current selection")
+
+    # --- SECCIÓN 3: ANÁLISIS DE CHURN Y RETENCIÓN ---
+    if tab_retention.open:
+        with tab_retention:
+            st.header("🔄 Customer Retention Intelligence & Churn Analysis")
+            if df_confirmadas.empty:
+                st.info(no_confirmadas_msg)
+            else:
+                retention_matrix = calculate_retention(df_confirmadas, filter_key)
+
+                if retention_matrix.shape[1] < 2:
+                    st.info("💡 Se necesita un rango de fechas de varios meses para calcular y visualizar la tasa de retención de cl")